@@ -26,6 +26,8 @@ program again.
 """
 
 import argparse
+import concurrent.futures
+import functools
 import logging
 import os
 import re
@@ -34,10 +36,62 @@ import struct
 import sys
 
 _log = logging.getLogger('lwl')
-_log_handler = logging.StreamHandler(sys.stdout)
-_log.addHandler(_log_handler)
+_log.propagate = False
+_log.setLevel(logging.WARNING)
 
-g_swab = False
+# Regular expressions used to parse the data file and the source files. They
+# are compiled once here, rather than for every file parsed.
+
+_LINE_PAT = re.compile(r'([0-9a-fA-F]+):\s*([0-9a-fA-F]+)')
+
+# Classifies a source line, with one match, as a fault data description, an
+# LWL_BASE_ID definition, or the start of an LWL statement. The group name of
+# the alternative that matched is given by lastgroup.
+_CLASSIFY_PAT = re.compile(
+    r'(?P<fault_data>.*?//@fault_data,(?P<fault_name>[^,]+),'
+    r'(?P<fault_num_bytes>\d+))|'
+    r'(?P<lwl_base_id>\s*#define\s+LWL_BASE_ID\s+(?P<base_id>\d+))|'
+    r'(?P<lwl>\s*LWL\()')
+
+_PARSE_FMT_PAT = re.compile(r'\s*LWL\("([^"]*)"')
+_PARSE_NUM_ARG_BYTES_PAT = re.compile(r'\s*,\s*([0-9]+)')
+_PARSE_ARG_PAT = re.compile(r',\s*LWL_([\d])\(')
+
+# struct format characters for unsigned values, keyed by number of bytes.
+
+_STRUCT_FMT_CHARS = {
+    1 : 'B',
+    2 : 'H',
+    4 : 'I',
+    8 : 'Q',
+    }
+
+# Below this number of source files, parsing them in a pool of processes costs
+# more than it saves.
+
+_MIN_FILES_FOR_POOL = 100
+
+################################################################################
+
+def _write_lines(lines):
+    """
+    Write lines of output to stdout with a single write, rather than one
+    print() per line.
+
+    Parameters:
+        lines (iterable of str) : The lines, without newlines.
+
+    If getting the lines raises an exception, the lines already produced are
+    written before it propagates.
+    """
+
+    out = []
+    try:
+        for line in lines:
+            out.append(line)
+    finally:
+        if out:
+            sys.stdout.write('\n'.join(out) + '\n')
 
 ################################################################################
 
@@ -64,8 +118,27 @@ class Data:
         }
 
     def __init__(self):
-        self.data_array = bytearray()
+        # The data is read-only once it has been read in, so it is kept as
+        # bytes, with a memoryview for slicing without copying.
+        self.data_array = bytes()
+        self._mv = memoryview(self.data_array)
         self.data_len = 0
+        self.set_endianess(False)
+
+    def set_endianess(self, swab):
+        """
+        Set the byte order used by get_data().
+
+        Parameters:
+            swab (boolean) : True for big endian, otherwise little endian.
+        """
+
+        self.swab = swab
+        prefix = '>' if swab else '<'
+        self.value_structs = {
+            num_bytes : struct.Struct(prefix + fmt_char)
+            for num_bytes, fmt_char in _STRUCT_FMT_CHARS.items()
+            }
 
     def read_data_file(self, file_path):
         """
@@ -82,8 +155,8 @@ class Data:
         """
 
         _log.debug('read_data_file(file_path=%s)', file_path)
-        line_pat = re.compile('([0-9a-fA-F]+):\s*([0-9a-fA-F]+)')
         expected_offset = 0
+        data_hex_chunks = []
         with open(file_path) as f:
             line_num = 0
             for line in f:
@@ -91,7 +164,7 @@ class Data:
                 line = line.strip()
                 #_log.debug('Got line: %s', line)
 
-                m = re.search(line_pat, line)
+                m = _LINE_PAT.match(line)
                 if m:
                     offset_hex = m.group(1)
                     data_hex = m.group(2)
@@ -116,9 +189,12 @@ class Data:
                         return False
 
                     _log.debug('Got fault data at offset 0x%08x',  offset)
-                    self.data_array.extend(bytearray.fromhex(data_hex))
-                    expected_offset += len(data_hex)/2
+                    data_hex_chunks.append(data_hex)
+                    expected_offset += len(data_hex) // 2
 
+        # Convert all of the data at once, rather than line by line.
+        self.data_array = bytes.fromhex(''.join(data_hex_chunks))
+        self._mv = memoryview(self.data_array)
         self.data_len = len(self.data_array)
         return True
 
@@ -151,17 +227,28 @@ class Data:
                       'idx=%d data_len=%d' % (idx, self.data_len))
                 return False
 
-            # Get magic of next segment and determine data type. We determine
-            # endianess by trial and error.
+            # The endianess is determined once, from the magic of the first
+            # section, by trying both byte orders.
+
+            if idx == 0:
+                if (struct.unpack_from('<I', self.data_array, idx)[0] in
+                    self.magic_to_fault_type):
+                    self.set_endianess(False)
+                elif (struct.unpack_from('>I', self.data_array, idx)[0] in
+                      self.magic_to_fault_type):
+                    self.set_endianess(True)
+                else:
+                    print('ERROR: Can not determine endianess from magic at '
+                          'idx %d' % (idx))
+                    return False
+
+            # Get magic of next segment and determine data type.
 
             magic = self.get_data(idx, 4)
             if magic not in self.magic_to_fault_type:
-                g_swab = not g_swab
-                magic = self.get_data(idx, 4)
-                if magic not in self.magic_to_fault_type:
-                    print('ERROR: Can not determine section type at idx %d' %
-                          (idx))
-                    return False
+                print('ERROR: Can not determine section type at idx %d' %
+                      (idx))
+                return False
             section_type = self.magic_to_fault_type[magic]
             section_len = self.get_data(idx + 4, 4)
             _log.debug('Got section magic=0x%08x type=%d len=%d',
@@ -176,9 +263,7 @@ class Data:
             elif section_type == self.SECTION_TYPE_LWL:
                 lwl_printer.pretty_print(idx, section_len)
             elif section_type == self.SECTION_TYPE_TRAILER:
-                print('=' * 80)
-                print("End of fault data")
-                print('=' * 80)
+                _write_lines(('=' * 80, 'End of fault data', '=' * 80))
             idx += section_len
 
         return True
@@ -196,30 +281,23 @@ class Data:
 
         Returns the value.
 
-        Note that little endian encoding is assumed, but if g_swab is True, we
-        use big endian.
+        Note that little endian encoding is assumed, but if self.swab is True,
+        we use big endian.
         """
 
-        _log.debug('get_data(idx=%d, num_bytes=%d)', idx, num_bytes)
+        if _log.isEnabledFor(logging.DEBUG):
+            _log.debug('get_data(idx=%d, num_bytes=%d)', idx, num_bytes)
 
-        save_idx = idx
-        value = 0
-        shift = 0
-
-        for loop_counter in range(num_bytes):
-            if idx >= self.data_len:
-                _log.debug('get_data() out of bytes')
-                raise EOFError
-            if g_swab:
-                value = (value << 8) + self.data_array[idx]
-            else:
-                value = value + (self.data_array[idx] << shift)
-                shift += 8
-            idx = idx + 1
+        if idx + num_bytes > self.data_len:
+            _log.debug('get_data() out of bytes')
+            raise EOFError
 
-        _log.debug('get_data(idx=%d, num_bytes=%d) returns %d)',
-                   save_idx, num_bytes, value)
-        return value
+        value_struct = self.value_structs.get(num_bytes)
+        if value_struct is None:
+            # Odd sized value, so there is no struct format for it.
+            return int.from_bytes(self._mv[idx:idx + num_bytes],
+                                  'big' if self.swab else 'little')
+        return value_struct.unpack_from(self.data_array, idx)[0]
 
     def get_data_circ(self, idx, num_bytes, buf_start_idx, buf_len,
                       put_idx, first_get):
@@ -240,62 +318,30 @@ class Data:
         Note that big endian encoding is assumed.
         """
 
-        save_idx = idx
-        _log.debug('get_data_circ(idx=%d num_bytes=%d buf_start_idx=%d '
-                   'buf_len=%d first_get=%s)',
-                   idx, num_bytes, buf_start_idx, buf_len, first_get)
+        if _log.isEnabledFor(logging.DEBUG):
+            _log.debug('get_data_circ(idx=%d num_bytes=%d buf_start_idx=%d '
+                       'buf_len=%d first_get=%s)',
+                       idx, num_bytes, buf_start_idx, buf_len, first_get)
         if idx >= buf_len:
             raise IndexError('ERROR: Invalid idx %d in get_data_circ' % idx)
         if put_idx >= buf_len:
             raise IndexError('ERROR: Invalid put_idx %d in get_data_circ' % idx)
 
-        value = 0
-        for loop_counter in range(num_bytes):
-            if idx == put_idx and not first_get:
-                raise EOFError
-            value = (value << 8) + self.data_array[buf_start_idx + idx]
-            idx = idx + 1
-            if idx >= buf_len:
-                idx = 0
-        _log.debug('get_data_circ(idx=%d, num_bytes=%d) returns (d=%d, idx=%d)',
-                   save_idx, num_bytes, value, idx)
-        return value, idx
+        # We run out of data if put_idx is one of the bytes to be read.
+        if not first_get and (put_idx - idx) % buf_len < num_bytes:
+            raise EOFError
 
-    def get_bytes_left_circ(self, idx,num_to_check_for, buf_start_idx, buf_len,
-                            put_idx, first_get):
-        """
-        Check if there are at least N bytes left in buffer.
-
-        Parameters:
-            idx (int)              : Current (relative) idx into buffer.
-            num_to_check_for (int) : Number of bytes to check for.
-            buf_start_idx (int)    : Starting index of buffer in data array.
-            buf_len (int)          : Number of bytes in the buffer.
-            put_idx (int)          : Buffer put_idx value.
-            first_get (boolean)    : True if getting first data from the buffer.
-        """
-
-        save_idx = idx
-        _log.debug('get_bytes_left_circ(idx=%d num_to_check_for=%d '
-                   'buf_start_idx=%d buf_len=%d first_get=%s)',
-                   idx, num_to_check_for, buf_start_idx, buf_len, first_get)
-        if idx >= buf_len:
-            raise IndexError('ERROR: Invalid idx %d in get_data_circ' % idx)
-        if put_idx >= buf_len:
-            raise IndexError('ERROR: Invalid put_idx %d in get_data_circ' % idx)
-        bytes_left = 0
-
-        for loop_counter in range(num_to_check_for):
-            if idx == put_idx and not first_get:
-                break
-            idx += 1
-            if idx >= buf_len:
-                idx = 0
-            bytes_left += 1
-        _log.debug('get_bytes_left_circ(idx=%d, num_to_check_for=%d) returns '
-                   '(bytes_left=%d, idx=%d)',
-                   save_idx, num_to_check_for, bytes_left, idx)
-        return bytes_left, idx
+        # Get the bytes with one slice, or two if the value wraps around the
+        # end of the buffer.
+        start = buf_start_idx + idx
+        end = idx + num_bytes
+        if end <= buf_len:
+            value_bytes = self._mv[start:start + num_bytes]
+        else:
+            value_bytes = (self.data_array[start:buf_start_idx + buf_len] +
+                           self.data_array[buf_start_idx:
+                                           buf_start_idx + end - buf_len])
+        return int.from_bytes(value_bytes, 'big'), end % buf_len
 
 ################################################################################
 
@@ -309,6 +355,8 @@ class FaultField:
         self.name = name
         self.offset = offset
         self.num_bytes = num_bytes
+        self.printable = not (name.startswith('pad') or
+                              name in ('magic', 'num_section_bytes'))
         _log.debug('Create FaultField name=%s offset=%d num_bytes=%d',
                    self.name, self.offset, self.num_bytes)
 
@@ -319,6 +367,7 @@ class FaultData:
     def __init__(self):
         self.fields = []
         self.max_name_len = 0
+        self.structs = {}
 
     def add_fault_field(self, name, offset, num_bytes):
         """
@@ -333,27 +382,90 @@ class FaultData:
         self.fields.append(FaultField(name, offset, num_bytes))
         if len(name) > self.max_name_len:
             self.max_name_len = len(name)
+        self.structs = {}
+
+    def get_struct(self, swab):
+        """
+        Get a struct for decoding all printable fields in one call.
+
+        Parameters:
+            swab (boolean) : True for big endian, otherwise little endian.
+
+        Return:
+            A struct.Struct, or None if the fields can't be described by one
+            (e.g. a printable field has an odd size, or fields overlap).
+
+        Non-printable fields, and any gaps between fields, are skipped using
+        pad bytes. The struct is built on first use and cached.
+        """
+
+        if swab in self.structs:
+            return self.structs[swab]
+
+        fmt = '>' if swab else '<'
+        next_offset = 0
+        for field in self.fields:
+            if field.offset < next_offset:
+                fmt = None
+                break
+            if field.offset > next_offset:
+                fmt += '%dx' % (field.offset - next_offset)
+            if not field.printable:
+                fmt += '%dx' % field.num_bytes
+            elif field.num_bytes in _STRUCT_FMT_CHARS:
+                fmt += _STRUCT_FMT_CHARS[field.num_bytes]
+            else:
+                fmt = None
+                break
+            next_offset = field.offset + field.num_bytes
+
+        self.structs[swab] = None if fmt is None else struct.Struct(fmt)
+        return self.structs[swab]
 
     def pretty_print(self, section_offset, section_len):
         """
         Pretty print the fault data.
 
+        Parameters:
+            section_offset (int) : Data array index of start of the section.
+            section_len (int)    : Length of segment in bytes.
+
+        The lines from format_lines() are written out all at once.
+        """
+
+        _write_lines(self.format_lines(section_offset, section_len))
+
+    def format_lines(self, section_offset, section_len):
+        """
+        Generate the pretty printed lines for the fault data.
+
         Parameters:
             section_offset (int) : Data array index of start of the section.
             section_len (int)    : Length of segment in bytes.
         """
 
-        print('=' * 80)
-        print('Fault data')
-        print('=' * 80)
+        yield '=' * 80
+        yield 'Fault data'
+        yield '=' * 80
+
+        # Decode all fields at once if possible, otherwise one at a time.
+        values = None
+        fields_struct = self.get_struct(g_data.swab)
+        if (fields_struct is not None and
+            section_offset + fields_struct.size <= g_data.data_len):
+            values = iter(fields_struct.unpack_from(g_data.data_array,
+                                                    section_offset))
+
         for field in self.fields:
-            if (field.name.startswith('pad') or
-                field.name in ('magic', 'num_section_bytes')):
+            if not field.printable:
                 continue
-            
-            value = g_data.get_data(section_offset + field.offset,
-                                    field.num_bytes)
-            print('%*s: 0x%08x (%d)' %
+
+            if values is not None:
+                value = next(values)
+            else:
+                value = g_data.get_data(section_offset + field.offset,
+                                        field.num_bytes)
+            yield ('%*s: 0x%08x (%d)' %
                   (self.max_name_len, field.name, value, value))
 
 ################################################################################
@@ -379,9 +491,17 @@ class LwlMsg:
         self.file_path = file_path
         self.line_num = line_num
         self.lwl_statement = lwl_statement
-        self.num_arg_bytes = 0
-        for d in self.arg_bytes:
-            self.num_arg_bytes += int(d)
+        self.arg_byte_sizes = tuple(int(d) for d in arg_bytes)
+        self.num_arg_bytes = sum(self.arg_byte_sizes)
+
+        # A struct for decoding all arguments (big endian) in one call, if
+        # possible.
+        if all(n in _STRUCT_FMT_CHARS for n in self.arg_byte_sizes):
+            self.arg_struct = struct.Struct(
+                '>' + ''.join(_STRUCT_FMT_CHARS[n]
+                              for n in self.arg_byte_sizes))
+        else:
+            self.arg_struct = None
         _log.debug('Create LwlMsg ID=%d arg_bytes=%s(%d) for %s:%d',
                    id, arg_bytes, self.num_arg_bytes, file_path, line_num)
 
@@ -398,6 +518,8 @@ class LwlMsgSet:
     def __init__(self):
         self.lwl_msgs = {}
         self.max_msg_len = 0
+        self.id_to_msg = None
+        self.id_to_num_arg_bytes = None
 
     def add_lwl_msg(self, id, fmt, arg_bytes, lwl_statement, file_path,
                     line_num):
@@ -423,20 +545,43 @@ class LwlMsgSet:
         else:
             self.lwl_msgs[id] = LwlMsg(id, fmt, arg_bytes, file_path,
                                        line_num, lwl_statement)
-            msg_len = 1
-            for len in arg_bytes:
-                msg_len += int(len)
+            self.id_to_msg = None
+            self.id_to_num_arg_bytes = None
+            msg_len = 1 + self.lwl_msgs[id].num_arg_bytes
             if msg_len > self.max_msg_len:
                 self.max_msg_len = msg_len
                 _log.debug('New max msg len %d for %s:%d %s',
                            msg_len, file_path, line_num, lwl_statement)
         return True
 
+    def freeze(self):
+        """
+        Build the lookup lists used when decoding, once all messages have been
+        added.
+
+        Both lists are indexed by message ID (0-255):
+            id_to_msg           : The LwlMsg, or None if the ID is not valid.
+            id_to_num_arg_bytes : Number of argument bytes, or -1 if the ID is
+                                  not valid.
+
+        Adding a message afterwards discards the lists, and this function
+        does nothing if they are already built.
+        """
+
+        if self.id_to_msg is not None:
+            return
+        self.id_to_msg = [None] * 256
+        self.id_to_num_arg_bytes = [-1] * 256
+        for id, msg in self.lwl_msgs.items():
+            if 0 <= id < 256:
+                self.id_to_msg[id] = msg
+                self.id_to_num_arg_bytes[id] = msg.num_arg_bytes
+
     def get_metadata(self, id):
-        try:
-            return self.lwl_msgs[id]
-        except KeyError:
-            return None
+        self.freeze()
+        if 0 <= id < 256:
+            return self.id_to_msg[id]
+        return None
 
     def get_num_lwl_statements(self):
         return len(self.lwl_msgs);
@@ -447,12 +592,147 @@ g_lwl_msg_set = LwlMsgSet()
 
 ################################################################################
 
+def _bytes_from_ring(data, buf_start_idx, buf_len, start_idx, end_idx):
+    """
+    Get the bytes between two indexes of a circular buffer.
+
+    Parameters:
+        data (bytes)        : The fault data array.
+        buf_start_idx (int) : Start of the buffer in the data array.
+        buf_len (int)       : Length of the buffer.
+        start_idx (int)     : Buffer index of the first byte.
+        end_idx (int)       : Buffer index after the last byte.
+
+    Return:
+        The bytes, with one slice, or two if they wrap around the end of the
+        buffer. If start_idx equals end_idx, no bytes are returned.
+    """
+
+    if start_idx <= end_idx:
+        return data[buf_start_idx + start_idx:buf_start_idx + end_idx]
+    return (data[buf_start_idx + start_idx:buf_start_idx + buf_len] +
+            data[buf_start_idx:buf_start_idx + end_idx])
+
+################################################################################
+
+def _scan_lwl_buf(data, buf_start_idx, buf_len, put_idx, start_idx, first_get,
+                  id_to_num_arg_bytes, max_invalid_ids):
+    """
+    Scan the LWL circular buffer from a starting index, counting messages.
+
+    Parameters:
+        data (bytes)              : The fault data array.
+        buf_start_idx (int)       : Start of LWL buffer in the data array.
+        buf_len (int)             : Length of LWL buffer.
+        put_idx (int)             : LWL buffer put_idx.
+        start_idx (int)           : Buffer index to start scanning at.
+        first_get (boolean)       : True if start_idx is put_idx.
+        id_to_num_arg_bytes (list): Argument bytes by ID (-1 if invalid).
+        max_invalid_ids (int)     : Stop once this many invalid IDs are seen.
+
+    Return:
+        invalid_id_ctr (int) : Number of invalid IDs found.
+        valid_id_ctr (int)   : Number of complete messages found.
+        bytes_left (int)     : Bytes of the final incomplete message, if any.
+
+    This is the inner loop of the optimal start index search, so it works
+    directly on the data bytes with plain integer arithmetic.
+    """
+
+    idx = start_idx
+    invalid_id_ctr = 0
+    valid_id_ctr = 0
+    bytes_left = 0
+
+    while invalid_id_ctr < max_invalid_ids:
+        # Get the ID, unless we are out of data.
+        if idx == put_idx and not first_get:
+            break
+        first_get = False
+        num_arg_bytes = id_to_num_arg_bytes[data[buf_start_idx + idx]]
+        idx += 1
+        if idx >= buf_len:
+            idx = 0
+        if num_arg_bytes < 0:
+            invalid_id_ctr += 1
+            continue
+
+        # The ID is valid. Skip over the argument bytes, if they are all
+        # there.
+        bytes_left = min(num_arg_bytes, (put_idx - idx) % buf_len)
+        idx = (idx + bytes_left) % buf_len
+        if bytes_left < num_arg_bytes:
+            # Add byte for ID.
+            bytes_left += 1
+            break
+        valid_id_ctr += 1
+
+    return invalid_id_ctr, valid_id_ctr, bytes_left
+
+################################################################################
+
+@functools.lru_cache(maxsize=8)
+def _optimal_start_idx(buf_start_idx, buf_len, put_idx, data_id):
+    """
+    Implementation of LwlPrinter.get_optimal_start_idx().
+
+    The result only depends on the (unchanging) fault data, so it is cached.
+    The data_id parameter (id of the data array) is only part of the cache key.
+    """
+
+    _log.debug('get_optimal_start_idx() put_idx=%d max_msg_len=%d', put_idx,
+               g_lwl_msg_set.max_msg_len)
+    optimal_invalid_ids = buf_len
+    optimal_start_idx = None
+    optimal_bytes_remaining = buf_len
+    g_lwl_msg_set.freeze()
+
+    for offset in range(g_lwl_msg_set.max_msg_len + 1):
+        start_idx = (put_idx + offset) % buf_len
+        _log.debug('Check for offset=%d start_idx=%d', offset, start_idx)
+        invalid_id_ctr, valid_id_ctr, bytes_left = _scan_lwl_buf(
+            g_data.data_array, buf_start_idx, buf_len, put_idx, start_idx,
+            offset == 0, g_lwl_msg_set.id_to_num_arg_bytes,
+            optimal_invalid_ids)
+
+        if _log.isEnabledFor(logging.DEBUG):
+            _log.debug('With offset=%d start_idx=%d invalid_id_ctr=%d '
+                       'valid_id_ctr=%d bytes_left=%d',
+                       offset, start_idx, invalid_id_ctr, valid_id_ctr,
+                       bytes_left)
+
+        if invalid_id_ctr < optimal_invalid_ids:
+            optimal_invalid_ids = invalid_id_ctr
+            optimal_start_idx = start_idx
+            optimal_bytes_left = bytes_left
+            _log.debug('New optimal start_idx %d put_idx %d '
+                       'invalid_id_ctr=%d valid_id_ctr=%d bytes_left=%d',
+                       start_idx, put_idx, invalid_id_ctr, valid_id_ctr,
+                       bytes_left)
+
+    return optimal_start_idx
+
+################################################################################
+
 class LwlPrinter:
 
     def pretty_print(self, section_offset, section_len):
         """
         Pretty print the LWL messages.
 
+        Parameters:
+            section_offset (int) : Data array index of start of the section.
+            section_len (int)    : Length of segment in bytes.
+
+        The lines from format_lines() are written out all at once.
+        """
+
+        _write_lines(self.format_lines(section_offset, section_len))
+
+    def format_lines(self, section_offset, section_len):
+        """
+        Generate the pretty printed lines for the LWL messages.
+
         Parameters:
             section_offset (int) : Data array index of start of the section.
             section_len (int)    : Length of segment in bytes.
@@ -464,13 +744,13 @@ class LwlPrinter:
         sync with the message boundary, using some ad-hoc process.
         """
 
-        _log.debug('pretty_print(section_offset=%d section_len=%d',
+        _log.debug('format_lines(section_offset=%d section_len=%d',
                    section_offset, section_len)
 
         # Following the section header (magic and length) 
-        print('=' * 80)
-        print('LWL')
-        print('=' * 80)
+        yield '=' * 80
+        yield 'LWL'
+        yield '=' * 80
 
         # The section layout is as follows:
         #
@@ -484,7 +764,7 @@ class LwlPrinter:
 
         # Assume a minimum buffer size of 4, meaning we need at least 20 bytes.
         if section_len < 20:
-            print('ERROR: Insufficient LWL buffer size - %d bytes' %
+            yield ('ERROR: Insufficient LWL buffer size - %d bytes' %
                   section_len);
             return
 
@@ -496,77 +776,81 @@ class LwlPrinter:
                    buf_len, put_idx, buf_start_idx)
 
         if buf_len + 16 != section_len:
-            print('ERROR: Invalid LWL buf_len: %d bytes' % buf_len)
+            yield 'ERROR: Invalid LWL buf_len: %d bytes' % buf_len
             return
         if put_idx >= buf_len:
-            print('ERROR: Invalid lwl put_idx: %d')
+            yield 'ERROR: Invalid lwl put_idx: %d'
             return
 
         idx =  self.get_optimal_start_idx(buf_start_idx, buf_len, put_idx)
-        first_get = True
-        skipped_data = []
-
-        try:        
-            while True:
-                # First we try to get the message ID. If we are not synced-up,
-                # we might have to try several bytes to get a valid message ID.
-                # Even if we get a valid message ID, it might be some random
-                # data that was a message ID.
-
-                id = None
-                id_idx = None
-                skipped_data = []
-                msg_meta = None
-
-                while True:
-                    id_idx = idx;
-
-                    id, idx = g_data.get_data_circ(
-                        idx, 1, buf_start_idx, buf_len, put_idx, first_get)
-                    first_get = False
-
-                    _log.debug('Got candidate id %d', id)
-
-                    msg_meta = g_lwl_msg_set.get_metadata(id)
-                    if msg_meta == None:
-                        id_idx = None
-                        skipped_data.append(id)
-                        continue
-                    break
-
-                # We have a potential ID, now get the arguments.
-                if skipped_data:
-                    print('Skipped data (hex): %s' %
-                          ' '.join(['%02x' % tmp for tmp in skipped_data]))
+        g_lwl_msg_set.freeze()
+        id_to_msg = g_lwl_msg_set.id_to_msg
+        data_array = g_data.data_array
+
+        # The data runs up to put_idx, or all the way around the buffer if we
+        # start at put_idx.
+        bytes_left = (put_idx - idx) % buf_len or buf_len
+
+        id = None
+        id_idx = idx
+        skipped_data = bytearray()
+
+        while bytes_left > 0:
+            # First we try to get the message ID. If we are not synced-up,
+            # we might have to try several bytes to get a valid message ID.
+            # Even if we get a valid message ID, it might be some random
+            # data that was a message ID.
+            id = data_array[buf_start_idx + idx]
+            idx = (idx + 1) % buf_len
+            bytes_left -= 1
+
+            msg_meta = id_to_msg[id]
+            if msg_meta == None:
+                skipped_data.append(id)
+                id_idx = idx
+                continue
+
+            # We have a potential ID, now get the arguments.
+            if skipped_data:
+                yield 'Skipped data (hex): %s' % skipped_data.hex(' ')
+                skipped_data = bytearray()
+
+            num_arg_bytes = msg_meta.num_arg_bytes
+            if num_arg_bytes > bytes_left:
+                break
 
+            # Decode the arguments in one call if possible. If they wrap
+            # around the end of the buffer, the bytes are joined first.
+            if msg_meta.arg_struct is not None:
+                if idx + num_arg_bytes <= buf_len:
+                    arg_values = msg_meta.arg_struct.unpack_from(
+                        data_array, buf_start_idx + idx)
+                else:
+                    arg_values = msg_meta.arg_struct.unpack(
+                        _bytes_from_ring(data_array, buf_start_idx, buf_len,
+                                         idx, idx + num_arg_bytes - buf_len))
+                idx = (idx + num_arg_bytes) % buf_len
+            else:
                 arg_values = []
-                for arg_bytes in msg_meta.arg_bytes:
-                    arg_bytes = int(arg_bytes)
+                for arg_bytes in msg_meta.arg_byte_sizes:
                     arg_value, idx = g_data.get_data_circ(
-                        idx, arg_bytes, buf_start_idx, buf_len,
-                        put_idx, first_get)
+                        idx, arg_bytes, buf_start_idx, buf_len, put_idx, False)
                     arg_values.append(arg_value)
-                _log.debug('id=%d arg_values=%s', id, arg_values)
-                print(msg_meta.fmt % tuple(arg_values))
-                _log.debug('----------------------------------------')
+            bytes_left -= num_arg_bytes
 
-        except EOFError:
-            pass
+            if _log.isEnabledFor(logging.DEBUG):
+                _log.debug('id=%d arg_values=%s', id, arg_values)
+            yield msg_meta.fmt % tuple(arg_values)
+            id = None
+            id_idx = idx
 
         if id is not None:
             # We were in the middle of a message when we ran out of data.
-            # We print out the unused data and let the user figure it out.
-            unused_data = bytearray()
-            try:
-                idx = id_idx
-                while True:
-                    value, idx = g_data.get_data_circ(
-                        idx, 1, buf_start_idx, buf_len, put_idx, first_get)
-                    unused_data.append(value)
-            except EOFError:
-                pass
-            print('Unused data (hex): %s' %
-                  ' '.join(['%02x' % tmp for tmp in unused_data]))
+            # We print out the unused data (up to put_idx) and let the user
+            # figure it out.
+            unused_data = _bytes_from_ring(data_array, buf_start_idx, buf_len,
+                                           id_idx, put_idx)
+            yield 'Unused data (hex): %s' % unused_data.hex(' ')
 
     def get_optimal_start_idx(self, buf_start_idx, buf_len, put_idx):
         """
@@ -593,67 +877,8 @@ class LwlPrinter:
         optimal offset, but likely is.
         """
 
-        _log.debug('get_optimal_start_idx() put_idx=%d max_msg_len=%d', put_idx,
-                   g_lwl_msg_set.max_msg_len)
-        optimal_invalid_ids = buf_len
-        optimal_start_idx = None
-        optimal_bytes_remaining = buf_len
-
-        for offset in range(g_lwl_msg_set.max_msg_len + 1):
-            start_idx = put_idx + offset
-            if start_idx >= buf_len:
-                start_idx -= buf_len
-            _log.debug('Check for offset=%d start_idx=%d', offset, start_idx)
-            idx = start_idx
-            first_get = offset == 0
-            invalid_id_ctr = 0
-            valid_id_ctr = 0
-            bytes_left = 0
-
-            while (True):
-                # Try to get ID.
-                try:
-                    id, idx = g_data.get_data_circ(
-                        idx, 1, buf_start_idx, buf_len, put_idx, first_get)
-                except EOFError:
-                    break
-
-                first_get = False
-                msg_meta = g_lwl_msg_set.get_metadata(id)
-                if msg_meta == None:
-                    _log.debug('Invalid ID %d at idx %d', id, idx);
-                    invalid_id_ctr += 1
-                    continue
-
-                _log.debug('Valid ID %d at idx %d', id, idx);
-
-                # The ID is valid. Try to get the argument bytes.
-                save_idx = idx
-                bytes_left, idx = g_data.get_bytes_left_circ(
-                    idx, msg_meta.num_arg_bytes, buf_start_idx,
-                    buf_len, put_idx, first_get)
-                if bytes_left < msg_meta.num_arg_bytes:
-                    _log.debug('Insufficient data for aguments')
-                    # Add byte for ID.
-                    bytes_left += 1
-                    break
-                valid_id_ctr += 1
-
-            _log.debug('With offset=%d start_idx=%d invalid_id_ctr=%d '
-                       'valid_id_ctr=%d bytes_left=%d',
-                       offset, start_idx, invalid_id_ctr, valid_id_ctr,
-                       bytes_left)
-
-            if invalid_id_ctr < optimal_invalid_ids:
-                optimal_invalid_ids = invalid_id_ctr
-                optimal_start_idx = start_idx
-                optimal_bytes_left = bytes_left
-                _log.debug('New optimal start_idx %d put_idx %d '
-                           'invalid_id_ctr=%d valid_id_ctr=%d bytes_left=%d',
-                           start_idx, put_idx, invalid_id_ctr, valid_id_ctr,
-                           bytes_left)
-
-        return optimal_start_idx
+        return _optimal_start_idx(buf_start_idx, buf_len, put_idx,
+                                  id(g_data.data_array))
 
 ################################################################################
 
@@ -664,18 +889,91 @@ lwl_printer = LwlPrinter()
 class SourceParser:
 
     def parse_source_dir(self, dir_path):
+        """
+        Parse all .c files under a directory, adding the meta data found to
+        g_fault_data and g_lwl_msg_set.
+
+        Parameters:
+            dir_path (str) : Directory to search (recursively).
+
+        Return:
+            The number of errors found.
+
+        If there are many files, they are parsed in parallel, by a pool of
+        processes, and the results are merged in this process. The files are
+        sorted, and the results merged in that order, so the output is
+        reproducible.
+        """
+
         error_count = 0
         _log.debug('parse_source_dir(dir_path=%s)', dir_path)
 
-        for root_dir_path, dir_names, file_names in os.walk(dir_path):
-            for file_name in file_names:
-                file_path = os.path.join(root_dir_path, file_name)
-                if file_path[-2:] != '.c':
-                    _log.debug('Skip parsing for %s', file_path)
-                    continue
-                error_count += self.parse_source_file(file_path)
+        file_paths = sorted(self.find_source_files(dir_path))
+        if len(file_paths) < _MIN_FILES_FOR_POOL:
+            for file_path in file_paths:
+                error_count += self.merge_source_file_result(
+                    *self.parse_source_file(file_path))
+            return error_count
+
+        with concurrent.futures.ProcessPoolExecutor(
+                initializer=_init_worker_logging,
+                initargs=(_log.level,)) as executor:
+            for result in executor.map(self.parse_source_file, file_paths,
+                                       chunksize=8):
+                error_count += self.merge_source_file_result(*result)
         return error_count
 
+    def merge_source_file_result(self, fault_fields, lwl_msgs, errors,
+                                 error_count):
+        """
+        Merge the result of parse_source_file() into the global meta data.
+
+        Parameters:
+            fault_fields (list) : (name, offset, num_bytes) tuples.
+            lwl_msgs (list)     : Argument tuples for LwlMsgSet.add_lwl_msg().
+            errors (list)       : Error messages to print.
+            error_count (int)   : Number of errors found by the parse.
+
+        Return:
+            The number of errors, including duplicate LWL IDs.
+        """
+
+        for error in errors:
+            print(error)
+        for fault_field in fault_fields:
+            g_fault_data.add_fault_field(*fault_field)
+        for lwl_msg in lwl_msgs:
+            if not g_lwl_msg_set.add_lwl_msg(*lwl_msg):
+                error_count += 1
+        return error_count
+
+    def find_source_files(self, dir_path):
+        """
+        Generate the paths of all .c files under a directory.
+
+        Parameters:
+            dir_path (str) : Directory to search (recursively).
+
+        As with os.walk(), the files in a directory come before those in its
+        subdirectories, symbolic links to directories are not followed, and
+        directories that can't be read are ignored.
+        """
+
+        try:
+            entries = list(os.scandir(dir_path))
+        except OSError:
+            _log.debug('Cannot scan directory %s', dir_path)
+            return
+
+        sub_dir_paths = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                sub_dir_paths.append(entry.path)
+            elif entry.name.endswith('.c') and entry.is_file():
+                yield entry.path
+        for sub_dir_path in sub_dir_paths:
+            yield from self.find_source_files(sub_dir_path)
+
     def parse_source_file(self, file_path):
         """
         Search through a source file (normally a .c or .h), finding meta data.
@@ -720,168 +1018,145 @@ class SourceParser:
 
             We assume fault data defintions are always on a single line.
 
+        This function does not change any global state, so it can be run in
+        another process. The meta data found is returned, and added with
+        merge_source_file_result().
+
+        Return:
+            fault_fields (list) : (name, offset, num_bytes) tuples.
+            lwl_msgs (list)     : Argument tuples for LwlMsgSet.add_lwl_msg().
+            errors (list)       : Error messages.
+            error_count (int)   : Number of errors found.
         """
 
         _log.debug('parse_source_file(file_path=%s)', file_path)
 
+        fault_fields = []
+        lwl_msgs = []
+        errors = []
         error_count = 0
         lwl_base_id = None
         fault_field_offset = 0
 
-        parse_fault_data_pat = re.compile('//@fault_data,([^,]+),(\d+)')
+        # Read the whole file at once, rather than line by line.
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
 
-        lwl_base_id_pat = re.compile('^\s*#define\s+LWL_BASE_ID\s+(\d+)')
-        lwl_num_pat = re.compile('^\s*#define\s+LWL_NUM\s+(\d+)')
-        detect_lwl_pat = re.compile('^\s*LWL\(')
-        parse_fmt_pat = re.compile('\s*LWL\("([^"]*)"')
-        parse_zero_pat = re.compile('\s*,\s*0')
-        parse_arg_string_pat = re.compile('\s*,\s*"([^"]*)"')
-        parse_num_arg_bytes_pat = re.compile('\s*,\s*([0-9]+)')
-        parse_arg_pat = re.compile(',\s*LWL_([\d])\(')
-        with open(file_path) as f:
-            line_num = 0
-            lwl_id_offset = -1
-            lwl_statement = None
-            for line in f:
-                line_num += 1
-                line = line.strip()
-                if not line:
-                    continue
-                #_log.debug('line=[%s]', line)
+        lwl_id_offset = -1
+        lwl_statement = None
+        for line_num, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line:
+                continue
+            #_log.debug('line=[%s]', line)
 
-                # Start with fault data descriptions.
-                m = re.search(parse_fault_data_pat, line)
-                if m:
-                    name = m.group(1)
-                    num_bytes = int(m.group(2))
-                    g_fault_data.add_fault_field(name, fault_field_offset,
-                                                 num_bytes)
-                    fault_field_offset += num_bytes
-                    continue
-
-                # Now for lwl statements.
-                m = re.match(lwl_base_id_pat, line)
-                if m:
-                    lwl_base_id = int(m.group(1))
-                    lwl_line_num = line_num
-                    _log.debug('%s:%d LWL_BASE_ID=%d',
-                               file_path, line_num, lwl_base_id)
-                    if lwl_base_id == 0:
-                        print('ERROR: %s:%d: Invalid LWL base ID %d' %
-                              (file_path, line_num, lwl_base_id))
-                if lwl_statement:
-                   # Check for acceptable line ending.
-                   if (line[-1] != ',') and (line[-2:] != ');'):
-                        print('ERROR: %s:%d: Invalid LWL continuation line: %s'
-                              % (file_path, line_num, line))
-                        error_count += 1
-                        lwl_statement = None
-                   else:
-                        lwl_statement += line
-                else:
-                    # Check for start of statement.
-                    if re.match(detect_lwl_pat, line):
-                        # Check for acceptable line ending.
-                        if (line[-2:] != ');') and (line[-1] != ','):
-                            print('ERROR: %s:%d: Invalid LWL line ending: %s' %
-                                  (file_path, line_num, line))
-                            error_count += 1
-                        else:
-                            lwl_statement = line
-                if (not lwl_statement) or (lwl_statement[-2:] != ');'):
-                    continue
-
-                # Got a complete statement. First get the format.
-                _log.debug('Got statement: %s', lwl_statement)
-                lwl_id_offset += 1
-                m = re.match(parse_fmt_pat, lwl_statement)
-                if not m:
-                    print('ERROR: %s:%d Cannot parse LWL fmt in %s' %
-                          (file_path, line_num, lwl_statement))
-                    error_count += 1
-                    lwl_statement = None
-                    continue
+            m = _CLASSIFY_PAT.match(line)
+            if m:
+                line_type = m.lastgroup
+            elif lwl_statement:
+                line_type = None
+            else:
+                continue
 
-                lwl_fmt = m.group(1)
-                lwl_remain = lwl_statement[m.end():]
-                _log.debug('Got fmt: %s, remain: %s', lwl_fmt, lwl_remain)
+            # Start with fault data descriptions.
+            if line_type == 'fault_data':
+                name = m.group('fault_name')
+                num_bytes = int(m.group('fault_num_bytes'))
+                fault_fields.append((name, fault_field_offset, num_bytes))
+                fault_field_offset += num_bytes
+                continue
 
-                # Get num_arg_bytes
-                m = re.match(parse_num_arg_bytes_pat, lwl_remain)
-                if m:
-                    lwl_num_arg_bytes = int(m.group(1))
-                else:
-                    print('ERROR: %s:%d Cannot parse LWL num arg bytes '
-                          'parameter in %s' %(file_path, line_num,
-                                              lwl_statement))
+            # Now for lwl statements.
+            if line_type == 'lwl_base_id':
+                lwl_base_id = int(m.group('base_id'))
+                lwl_line_num = line_num
+                _log.debug('%s:%d LWL_BASE_ID=%d',
+                           file_path, line_num, lwl_base_id)
+                if lwl_base_id == 0:
+                    errors.append('ERROR: %s:%d: Invalid LWL base ID %d' %
+                                  (file_path, line_num, lwl_base_id))
+            if lwl_statement:
+               # Check for acceptable line ending.
+               if (line[-1] != ',') and (line[-2:] != ');'):
+                    errors.append('ERROR: %s:%d: Invalid LWL continuation '
+                                  'line: %s' % (file_path, line_num, line))
                     error_count += 1
                     lwl_statement = None
-                    continue
-                lwl_remain = lwl_remain[m.end():]
-                _log.debug('Got num_arg_bytes: %d, remain: %s',
-                           lwl_num_arg_bytes, lwl_remain)
-
-                # Get the arg lengths
-                lwl_arg_lengths = ''
-                num_arg_bytes_check = 0
-                while True:
-                    m = re.search(parse_arg_pat, lwl_remain)
-                    if m:
-                        lwl_arg_lengths += m.group(1)
-                        num_arg_bytes_check += int(m.group(1))
-                        lwl_remain = lwl_remain[m.end():]
-                        _log.debug('Got arg length: %s, remain: %s',
-                                   m.group(1), lwl_remain)
+               else:
+                    lwl_statement += line
+            else:
+                # Check for start of statement.
+                if line_type == 'lwl':
+                    # Check for acceptable line ending.
+                    if (line[-2:] != ');') and (line[-1] != ','):
+                        errors.append('ERROR: %s:%d: Invalid LWL line '
+                                      'ending: %s' %
+                                      (file_path, line_num, line))
+                        error_count += 1
                     else:
-                        _log.debug('Out of args')
-                        break
-
-                if num_arg_bytes_check != lwl_num_arg_bytes:
-                    print('ERROR: %s:%d Inconsistent num arg bytes '
-                          '(%d vs %d) in %s' %(file_path, line_num,
-                                               num_arg_bytes_check,
-                                               lwl_num_arg_bytes,
-                                               lwl_statement))
-
-                _log.debug('[%s] [%s] [%d] [%s]', lwl_id_offset, lwl_fmt,
-                           lwl_num_arg_bytes, lwl_arg_lengths)
-                if lwl_base_id is None:
-                    print('ERROR: %s:%d No #define LWL_BASE_ID present' %
-                          (file_path, line_num))
-                    error_count += 1
-                    lwl_statement = None
-                    continue
-                
-                if not g_lwl_msg_set.add_lwl_msg(lwl_base_id +
-                                                 int(lwl_id_offset),
-                                                 lwl_fmt, lwl_arg_lengths,
-                                                 lwl_statement, file_path,
-                                                 lwl_line_num):
-                    error_count += 1
+                        lwl_statement = line
+            if (not lwl_statement) or (lwl_statement[-2:] != ');'):
+                continue
 
+            # Got a complete statement. First get the format.
+            _log.debug('Got statement: %s', lwl_statement)
+            lwl_id_offset += 1
+            m = _PARSE_FMT_PAT.match(lwl_statement)
+            if not m:
+                errors.append('ERROR: %s:%d Cannot parse LWL fmt in %s' %
+                              (file_path, line_num, lwl_statement))
+                error_count += 1
                 lwl_statement = None
                 continue
-        return error_count
 
-    def get_num_fmt_params(self, fmt):
-        """ Returns the number of parameters required for a format string."""
+            lwl_fmt = m.group(1)
+            lwl_remain = lwl_statement[m.end():]
+            _log.debug('Got fmt: %s, remain: %s', lwl_fmt, lwl_remain)
 
-        state = 'idle'
-        num_params = 0
-        for c in fmt:
-            if state == 'idle':
-                if c == "%":
-                    state = 'got_percent'
+            # Get num_arg_bytes
+            m = _PARSE_NUM_ARG_BYTES_PAT.match(lwl_remain)
+            if m:
+                lwl_num_arg_bytes = int(m.group(1))
+            else:
+                errors.append('ERROR: %s:%d Cannot parse LWL num arg bytes '
+                              'parameter in %s' %(file_path, line_num,
+                                                  lwl_statement))
+                error_count += 1
+                lwl_statement = None
                 continue
-            if state == 'got_percent':
-                if c == "%":
-                    state = 'idle'
-                else:
-                    num_params += 1
-                    state = 'idle'
+            lwl_remain = lwl_remain[m.end():]
+            _log.debug('Got num_arg_bytes: %d, remain: %s',
+                       lwl_num_arg_bytes, lwl_remain)
+
+            # Get the arg lengths
+            arg_lengths = _PARSE_ARG_PAT.findall(lwl_remain)
+            lwl_arg_lengths = ''.join(arg_lengths)
+            num_arg_bytes_check = sum(int(l) for l in arg_lengths)
+            _log.debug('Got arg lengths: %s', lwl_arg_lengths)
+
+            if num_arg_bytes_check != lwl_num_arg_bytes:
+                errors.append('ERROR: %s:%d Inconsistent num arg bytes '
+                              '(%d vs %d) in %s' %(file_path, line_num,
+                                                   num_arg_bytes_check,
+                                                   lwl_num_arg_bytes,
+                                                   lwl_statement))
+
+            _log.debug('[%s] [%s] [%d] [%s]', lwl_id_offset, lwl_fmt,
+                       lwl_num_arg_bytes, lwl_arg_lengths)
+            if lwl_base_id is None:
+                errors.append('ERROR: %s:%d No #define LWL_BASE_ID present' %
+                              (file_path, line_num))
+                error_count += 1
+                lwl_statement = None
                 continue
-        _log.debug('get_num_fmt_params(%s) returns %d', fmt, num_params)
-        return num_params
+                
+            lwl_msgs.append((lwl_base_id + int(lwl_id_offset), lwl_fmt,
+                             lwl_arg_lengths, lwl_statement, file_path,
+                             lwl_line_num))
+
+            lwl_statement = None
+            continue
+        return fault_fields, lwl_msgs, errors, error_count
 
 ################################################################################
 
@@ -890,9 +1165,31 @@ source_parser = SourceParser()
 ################################################################################
 
 
-def main():
-    _log.setLevel(logging.INFO)
+def configure_logging(level):
+    """
+    Send log output to stdout, at the given level.
+
+    This is only done when running as a program, so importing this module has
+    no logging side effects.
+    """
+
+    _log.addHandler(logging.StreamHandler(sys.stdout))
+    _log.setLevel(level)
+
+def _init_worker_logging(level):
+    """
+    Set up logging in a source parsing worker process, like the main process.
+
+    A forked worker already has the handler, but a spawned one starts with
+    none.
+    """
 
+    if _log.handlers:
+        _log.setLevel(level)
+    else:
+        configure_logging(level)
+
+def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-f',
                         help='Fault data file (default=None)',
@@ -920,7 +1217,7 @@ def main():
         for level, int_level in log_map.items():
             print('  %s' % (level.lower()))
         exit(1)
-    _log.setLevel(log_map[args.log.upper()])
+    configure_logging(log_map[args.log.upper()])
 
     error_count = 0
     if not args.d:
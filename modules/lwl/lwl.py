@@ -1,15 +1,22 @@
 import argparse
+import functools
 import logging
 import os
 import re
-import string
-import struct
 import sys
 
 _log = logging.getLogger('lwl')
 _log_handler = logging.StreamHandler(sys.stdout)
 _log.addHandler(_log_handler)
 
+# Patterns used to parse source files.
+_LWL_BID_PAT = re.compile(r'^\s*#define\s+LWL_BASE_ID\s+(\d+)')
+
+# Patterns used to parse data files.
+_SIZE_PAT = re.compile(r'^size:(\d+)')
+_PUT_PAT = re.compile(r'^put:(\d+)')
+_HEX_PAT = re.compile(r'[0-9a-fA-F]+')
+
 class LwlMsg:
     """
     This class represents the meta data for a single LWL messages.
@@ -25,11 +32,11 @@ class LwlMsg:
         self.file_path = file_path
         self.line_num = line_num
         self.lwl_statement = lwl_statement
-        self.num_arg_bytes = 0
-        for d in self.arg_bytes:
-            self.num_arg_bytes += int(d)
-        _log.debug('Create LwlMsg ID=%d arg_bytes=%s(%d) for %s:%d' %
-                   (id, arg_bytes, self.num_arg_bytes, file_path, line_num))
+        self.arg_byte_sizes = tuple(int(d) for d in arg_bytes)
+        self.num_arg_bytes = sum(self.arg_byte_sizes)
+        self.total_msg_len = 1 + self.num_arg_bytes
+        _log.debug('Create LwlMsg ID=%d arg_bytes=%s(%d) for %s:%d',
+                   id, arg_bytes, self.num_arg_bytes, file_path, line_num)
 
 class LwlMsgSet:
     """
@@ -42,55 +49,174 @@ class LwlMsgSet:
     def __init__(self):
         self.lwl_msgs = {}
         self.max_msg_len = 0
+
+        # Messages indexed by ID, for fast lookup of IDs read from the data
+        # (which are one byte).
+        self._by_id = [None] * 256
+
     def add_lwl_msg(self, id, fmt, arg_bytes, lwl_statement, file_path,
-                    line_num):
+                    line_num, errors=None):
+        """
+        Add a LWL message.
+
+        Parameters:
+            id (int)            : LWL statement ID (must be unique).
+            fmt (str)           : LWL statement format string.
+            arg_bytes (str)     : Argument bytes (lengths) string.
+            lwl_statement (str) : Full LWL statement text.
+            file_path (str)     : File name containing LWL statement.
+            line_num (int)      : Line number of LWL statement.
+            errors (list)       : If given, error messages are appended to it
+                                  rather than printed.
+
+        Return:
+            False if the ID is a duplicate, else True.
+        """
+
         if id in self.lwl_msgs:
-            print('%s:%d Duplicate ID %d: %s, previously at %s:%d: %s' %
-                  (file_path, line_num, id, lwl_statement,
-                   self.lwl_msgs[id].file_path,
-                   self.lwl_msgs[id].line_num, 
-                   self.lwl_msgs[id].lwl_statement))
+            error = ('%s:%d Duplicate ID %d: %s, previously at %s:%d: %s' %
+                     (file_path, line_num, id, lwl_statement,
+                      self.lwl_msgs[id].file_path,
+                      self.lwl_msgs[id].line_num,
+                      self.lwl_msgs[id].lwl_statement))
+            if errors is None:
+                print(error)
+            else:
+                errors.append(error)
             return False
         else:
-            self.lwl_msgs[id] = LwlMsg(id, fmt, arg_bytes,
-                                       file_path, line_num, lwl_statement)
-            msg_len = 1
-            for l in arg_bytes:
-                msg_len += int(l)
+            msg = LwlMsg(id, fmt, arg_bytes, file_path, line_num, lwl_statement)
+            self.lwl_msgs[id] = msg
+            if 0 <= id < 256:
+                self._by_id[id] = msg
+            msg_len = msg.total_msg_len
             if msg_len > self.max_msg_len:
                 self.max_msg_len = msg_len
-                _log.debug('New max msg len %d for %s:%d %s' %
-                           (msg_len, file_path, line_num, lwl_statement))
+                _log.debug('New max msg len %d for %s:%d %s',
+                           msg_len, file_path, line_num, lwl_statement)
         return True
 
     def get_metadata(self, id):
-        try:
-            return self.lwl_msgs[id]
-        except KeyError:
-            return None
+        if 0 <= id < 256:
+            return self._by_id[id]
+        return None
 
 lwl_msg_set = LwlMsgSet()
 
+@functools.lru_cache(maxsize=None)
 def get_num_fmt_params(fmt):
-    """ Returns the number of parameters required for a format string."""
-
-    state = 'idle'
-    num_params = 0
-    for c in fmt:
-        if state == 'idle':
-            if c == "%":
-                state = 'got_percent'
-            continue
-        if state == 'got_percent':
-            if c == "%":
-                state = 'idle'
-            else:
-                num_params += 1
-                state = 'idle'
-            continue
-    _log.debug('get_num_fmt_params(%s) returns %d', fmt, num_params)
+    """
+    Returns the number of parameters required for a format string.
+
+    The same format strings tend to be used in many LWL statements, so the
+    results are cached.
+    """
+
+    # Each "%%" is a literal percent sign, and any other "%" starts a
+    # parameter, except for an unpaired "%" at the very end.
+    num_params = fmt.count('%') - 2 * fmt.count('%%')
+    if (len(fmt) - len(fmt.rstrip('%'))) % 2:
+        num_params -= 1
+    if _log.isEnabledFor(logging.DEBUG):
+        _log.debug('get_num_fmt_params(%s) returns %d', fmt, num_params)
     return num_params
 
+def _parse_lwl_string_arg(s, idx, null_ok):
+    """
+    Parse a comma followed by a quoted string argument of an LWL statement.
+
+    Parameters:
+        s (str)         : The LWL statement.
+        idx (int)       : Index in s to start at.
+        null_ok (bool)  : True if NULL is allowed in place of the string.
+
+    Return:
+        value (str) : The string (without quotes), '' for NULL, or None if
+                      it could not be parsed.
+        idx (int)   : Index in s after the argument.
+    """
+
+    n = len(s)
+    while idx < n and s[idx].isspace():
+        idx += 1
+    if idx >= n or s[idx] != ',':
+        return None, idx
+    idx += 1
+    while idx < n and s[idx].isspace():
+        idx += 1
+    if null_ok and s.startswith('NULL', idx):
+        return '', idx + 4
+    if idx >= n or s[idx] != '"':
+        return None, idx
+    end_idx = s.find('"', idx + 1)
+    if end_idx < 0:
+        return None, idx
+    return s[idx + 1:end_idx], end_idx + 1
+
+def _parse_lwl_statement(s):
+    """
+    Parse a complete LWL statement.
+
+    Parameters:
+        s (str) : The LWL statement, e.g. 'LWL(3, "Trace fmt %d", "2", abc);'
+
+    Return:
+        cmd (str)       : 'LWL' or 'LWLX'.
+        id_offset (str) : The ID (offset from LWL_BASE_ID) digits.
+        fmt (str)       : The format string.
+        arg_types (str) : The arg types string ('' for NULL), or None for LWL.
+        arg_bytes (str) : The arg bytes (lengths) string ('' for NULL).
+
+    Raises:
+        ValueError, with the name of the part that could not be parsed.
+
+    This is a simple scanner over the statement, rather than a series of regex
+    matches, as this is done for every LWL statement in the source.
+    """
+
+    n = len(s)
+    idx = 0
+    while idx < n and s[idx].isspace():
+        idx += 1
+
+    # Get the command and ID.
+    if not s.startswith('LWL', idx):
+        raise ValueError('ID')
+    idx += 3
+    if s.startswith('X(', idx):
+        cmd = 'LWLX'
+        idx += 2
+    elif s.startswith('(', idx):
+        cmd = 'LWL'
+        idx += 1
+    else:
+        raise ValueError('ID')
+    start_idx = idx
+    while idx < n and s[idx].isdecimal():
+        idx += 1
+    if idx == start_idx:
+        raise ValueError('ID')
+    id_offset = s[start_idx:idx]
+
+    # Get the format string.
+    fmt, idx = _parse_lwl_string_arg(s, idx, False)
+    if fmt is None:
+        raise ValueError('fmt')
+
+    # If LWLX, get arg type string (or NULL).
+    arg_types = None
+    if cmd == 'LWLX':
+        arg_types, idx = _parse_lwl_string_arg(s, idx, True)
+        if arg_types is None:
+            raise ValueError('arg types string')
+
+    # Get arg bytes (lengths) string (or NULL).
+    arg_bytes, idx = _parse_lwl_string_arg(s, idx, True)
+    if arg_bytes is None:
+        raise ValueError('arg bytes string')
+
+    return cmd, id_offset, fmt, arg_types, arg_bytes
+
 def parse_source_file(file_path):
     """
     Search through a source file (normally a .c or .h), find all LWL message
@@ -113,139 +239,94 @@ def parse_source_file(file_path):
 
     lwl_bid = None
     error_count = 0
+    errors = []
     _log.debug('parse_source_file(file_path=%s)', file_path)
-    lwl_bid_pat = re.compile('^\s*#define\s+LWL_BASE_ID\s+(\d+)')
-    detect_lwl_pat = re.compile('^\s*LWLX?\(')
-    parse_id_pat = re.compile('^\s*(LWLX?)\((\d+)')
-    parse_fmt_pat = re.compile('\s*,\s*"([^"]*)"')
-    parse_null_arg_string_pat = re.compile('\s*,\s*NULL')
-    parse_arg_string_pat = re.compile('\s*,\s*"([^"]*)"')
-    with open(file_path) as f:
-        line_num = 0
-        lwl_statement = None
-        for line in f:
-            line_num += 1
-            line = line.strip()
-            if not line:
-                continue
-            #_log.debug('line=[%s]', line)
+    with open(file_path, encoding='utf-8', errors='replace') as f:
+        text = f.read()
 
-            m = re.match(lwl_bid_pat, line)
-            if m:
-                lwl_bid = int(m.group(1))
-                lwl_line_num = line_num
-                _log.debug('%s:%d LWL_BASE_ID=%d' % (file_path, line_num, lwl_bid))
-                if lwl_bid == 0:
-                    print('ERROR: %s:%d: Invalid LWL base ID %d' %
-                          (file_path, line_num, lwl_bid))
-            if lwl_statement:
-               # Check for acceptable line ending.
-               if (line[-1] != ',') and (line[-2:] != ');'):
-                    print('ERROR: %s:%d: Invalid LWL continuation line: %s' %
-                          (file_path, line_num, line))
-                    error_count += 1
-                    lwl_statement = None
-               else:
-                    lwl_statement += line
-            else:
-                # Check for start of statement.
-                if re.match(detect_lwl_pat, line):
-                    # Check for acceptable line ending.
-                    if (line[-2:] != ');') and (line[-1] != ','):
-                        print('ERROR: %s:%d: Invalid LWL line ending: %s' %
-                              (file_path, line_num, line))
-                        error_count += 1
-                    else:
-                        lwl_statement = line
-            if (not lwl_statement) or (lwl_statement[-2:] != ');'):
-                continue
+    lwl_statement = None
+    for line_num, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        #_log.debug('line=[%s]', line)
 
-            # Got a complete statement. First get the ID
-            _log.debug('Got statement: %s' % lwl_statement)
-            m = re.match(parse_id_pat, lwl_statement)
-            if not m:
-                print('ERROR: %s:%d Cannot parse LWL ID in %s' %
-                      (file_path, line_num, lwl_statement))
-                error_count += 1
-                lwl_statement = None
-                continue
-            lwl_cmd = m.group(1)
-            lwl_id_offset = m.group(2)
-            lwl_remain = lwl_statement[m.end():]
-            _log.debug('Got ID: %s, remain=%s' % (lwl_id_offset, lwl_remain))
-
-            # Get format string
-            m = re.match(parse_fmt_pat, lwl_remain)
-            if not m:
-                print('ERROR: %s:%d Cannot parse LWL fmt in %s' %
-                      (file_path, line_num, lwl_statement))
+        # Most lines have nothing to do with LWL, so reject them quickly.
+        if not lwl_statement and 'LWL' not in line:
+            continue
+
+        m = None
+        if line.startswith('#define'):
+            m = _LWL_BID_PAT.match(line)
+        if m:
+            lwl_bid = int(m.group(1))
+            lwl_line_num = line_num
+            _log.debug('%s:%d LWL_BASE_ID=%d', file_path, line_num, lwl_bid)
+            if lwl_bid == 0:
+                errors.append('ERROR: %s:%d: Invalid LWL base ID %d' %
+                              (file_path, line_num, lwl_bid))
+        if lwl_statement:
+           # Check for acceptable line ending.
+           if (line[-1] != ',') and (line[-2:] != ');'):
+                errors.append('ERROR: %s:%d: Invalid LWL continuation line: '
+                              '%s' % (file_path, line_num, line))
                 error_count += 1
                 lwl_statement = None
-                continue
-
-            lwl_fmt = m.group(1)
-            lwl_remain = lwl_remain[m.end():]
-            _log.debug('Got fmt: %s, remain=%s' % (lwl_fmt, lwl_remain))
-
-            # If LWLX, get arg type string (or NULL)
-            if lwl_cmd == 'LWLX':
-                m = re.match(parse_null_arg_string_pat, lwl_remain)
-                if m:
-                    lwl_arg_types = ''
-                else:
-                    m = re.match(parse_arg_string_pat, lwl_remain)
-                    if m:
-                        lwl_arg_types = m.group(1)
-                    else:
-                        print('ERROR: %s:%d Cannot parse LWL arg types string '
-                              'in %s' % (file_path, line_num, lwl_statement))
-                        error_count += 1
-                        lwl_statement = None
-                        continue
-                lwl_remain = lwl_remain[m.end():]
-                _log.debug('Got lwl_arg_types: %s, remain=%s' %
-                           (lwl_arg_types, lwl_remain))
-
-            # Get arg bytes (lengths) string (or NULL)
-            m = re.match(parse_null_arg_string_pat, lwl_remain)
-            if m:
-                lwl_arg_bytes = ''
-            else:
-                m = re.match(parse_arg_string_pat, lwl_remain)
-                if m:
-                    lwl_arg_bytes = m.group(1)
-                else:
-                    print('ERROR: %s:%d Cannot parse LWL arg bytes string '
-                          'in %s' %(file_path, line_num, lwl_statement))
+           else:
+                lwl_statement += line
+        else:
+            # Check for start of statement.
+            if line.startswith(('LWL(', 'LWLX(')):
+                # Check for acceptable line ending.
+                if (line[-2:] != ');') and (line[-1] != ','):
+                    errors.append('ERROR: %s:%d: Invalid LWL line ending: %s' %
+                                  (file_path, line_num, line))
                     error_count += 1
-                    lwl_statement = None
-                    continue
-            _log.debug('Got arg_bytes: %s' % (lwl_arg_bytes))
+                else:
+                    lwl_statement = line
+        if (not lwl_statement) or (lwl_statement[-2:] != ');'):
+            continue
 
-            if get_num_fmt_params(lwl_fmt) != len(lwl_arg_bytes):
-                print('ERROR: %s:%d Inconsistent fmt and arg length strings: "%s" vs "%s"' %
-                      (file_path, line_num, lwl_fmt, lwl_arg_bytes))
-                error_count += 1
-                lwl_statement = None
-                continue
+        # Got a complete statement, parse it.
+        _log.debug('Got statement: %s', lwl_statement)
+        try:
+            (lwl_cmd, lwl_id_offset, lwl_fmt, lwl_arg_types,
+             lwl_arg_bytes) = _parse_lwl_statement(lwl_statement)
+        except ValueError as e:
+            errors.append('ERROR: %s:%d Cannot parse LWL %s in %s' %
+                          (file_path, line_num, e, lwl_statement))
+            error_count += 1
+            lwl_statement = None
+            continue
 
-            _log.debug('[%s] [%s] [%s]' % (lwl_id_offset, lwl_fmt,
-                                           lwl_arg_bytes))
-            if lwl_bid is None:
-                print('ERROR: %s:%d No #define LWL_BASE_ID present' %
-                      (file_path, line_num))
-                error_count += 1
-                lwl_statement = None
-                continue
-            
-            if not lwl_msg_set.add_lwl_msg(lwl_bid + int(lwl_id_offset),
-                                           lwl_fmt, lwl_arg_bytes,
-                                           lwl_statement, file_path,
-                                           lwl_line_num):
-                error_count += 1
+        if get_num_fmt_params(lwl_fmt) != len(lwl_arg_bytes):
+            errors.append('ERROR: %s:%d Inconsistent fmt and arg length '
+                          'strings: "%s" vs "%s"' %
+                          (file_path, line_num, lwl_fmt, lwl_arg_bytes))
+            error_count += 1
+            lwl_statement = None
+            continue
 
+        _log.debug('[%s] [%s] [%s]', lwl_id_offset, lwl_fmt, lwl_arg_bytes)
+        if lwl_bid is None:
+            errors.append('ERROR: %s:%d No #define LWL_BASE_ID present' %
+                          (file_path, line_num))
+            error_count += 1
             lwl_statement = None
             continue
+            
+        if not lwl_msg_set.add_lwl_msg(lwl_bid + int(lwl_id_offset),
+                                       lwl_fmt, lwl_arg_bytes,
+                                       lwl_statement, file_path,
+                                       lwl_line_num, errors):
+            error_count += 1
+
+        lwl_statement = None
+        continue
+
+    # Report the errors for the file all at once.
+    if errors:
+        sys.stdout.write('\n'.join(errors) + '\n')
     return error_count
 
 def get_data_bytes(data, idx, num_bytes, start_idx, first_get):
@@ -253,7 +334,7 @@ def get_data_bytes(data, idx, num_bytes, start_idx, first_get):
     Return next value (one or more bytes) from array and advance the index.
 
     Parameters:
-        data (bytearray)    : Encoded data (little endian)
+        data (memoryview)   : Encoded data (little endian)
         num_bytes (int)     : Number of bytes in value
         start_idx (int)     : The starting point for the data (put index)
         first_get (boolean) : True if getting first byte (at start_idx)
@@ -268,32 +349,84 @@ def get_data_bytes(data, idx, num_bytes, start_idx, first_get):
     Note that several parameters are provided just to allow this function to
     detect when all data has been consumed.
     """
-    _log.debug('get_data_bytes(idx=%d, num_bytes=%d start_idx=%d '
-               'first_get=%d)' % (idx, num_bytes, start_idx, first_get))
+    debug = _log.isEnabledFor(logging.DEBUG)
+    if debug:
+        _log.debug('get_data_bytes(idx=%d, num_bytes=%d start_idx=%d '
+                   'first_get=%d)', idx, num_bytes, start_idx, first_get)
     if idx >= len(data):
         raise IndexError("len(data)=%d idx=%d" % (len(data), idx))
 
+    # We run out of data if start_idx is one of the bytes to be read.
     save_idx = idx
-    d = 0
-    factor = 1
-    for loop_counter in range(num_bytes):
-        if idx == start_idx and not first_get:
-            raise EOFError
-        d = d + data[idx]*factor
-        factor = factor * 256;
-        idx = idx + 1
-        if idx >= len(data):
-            idx = 0
-    _log.debug('get_data_bytes(idx=%d, num_bytes=%d) returns (d=%d, idx=%d)',
-               save_idx, num_bytes, d, idx)
+    data_len = len(data)
+    if not first_get and (start_idx - idx) % data_len < num_bytes:
+        raise EOFError
+
+    # Get the bytes with one slice, or two if the value wraps around the end
+    # of the data.
+    idx += num_bytes
+    if idx <= data_len:
+        d = int.from_bytes(data[save_idx:idx], 'little')
+    else:
+        idx -= data_len
+        d = int.from_bytes(bytes(data[save_idx:]) + bytes(data[:idx]),
+                           'little')
+    if idx >= data_len:
+        idx = 0
+    if debug:
+        _log.debug('get_data_bytes(idx=%d, num_bytes=%d) returns '
+                   '(d=%d, idx=%d)', save_idx, num_bytes, d, idx)
     return d, idx
     
+def _count_invalid_ids(data, put_idx, start_idx, id_to_num_arg_bytes,
+                       max_invalid_ids):
+    """
+    Count the invalid message IDs found decoding the log buffer from an index.
+
+    Parameters:
+        data (memoryview)          : Log data buffer.
+        put_idx (int)              : The index of the next buffer byte to write.
+        start_idx (int)            : The index to start decoding at.
+        id_to_num_arg_bytes (list) : Argument bytes by ID (-1 if invalid).
+        max_invalid_ids (int)      : Stop once this many invalid IDs are found.
+
+    Return:
+        The number of invalid IDs found (at most max_invalid_ids).
+
+    This is the inner loop of get_optimal_start_idx(), so it only does integer
+    arithmetic and indexing on the data and the table.
+    """
+
+    num_data_bytes = len(data)
+    idx = start_idx
+    first_get = True
+    invalid_id_ctr = 0
+
+    # Walk the buffer, jumping over the arguments of each valid ID.
+    while invalid_id_ctr < max_invalid_ids:
+        if idx == put_idx and not first_get:
+            break
+        first_get = False
+        num_arg_bytes = id_to_num_arg_bytes[data[idx]]
+        idx += 1
+        if idx >= num_data_bytes:
+            idx = 0
+        if num_arg_bytes < 0:
+            invalid_id_ctr += 1
+            continue
+
+        # The ID is valid. Skip the argument bytes, if they are all there.
+        if (put_idx - idx) % num_data_bytes >= num_arg_bytes:
+            idx = (idx + num_arg_bytes) % num_data_bytes
+
+    return invalid_id_ctr
+
 def get_optimal_start_idx(data, put_idx):
     """
     Find the optimal starting index to decode log buffer.
 
     Parameters:
-        data (bytearray)  : Log data buffer.
+        data (memoryview) : Log data buffer.
         put_idx (idx)     : The index of the next buffer byte to write log data.
 
     Return:
@@ -312,56 +445,41 @@ def get_optimal_start_idx(data, put_idx):
 
     """
 
-    _log.debug('get_optimal_start_idx(put_idx=%d)' % put_idx)
+    _log.debug('get_optimal_start_idx(put_idx=%d)', put_idx)
     min_invalid_ids = len(data)
     optimal_start_idx = None
     num_data_bytes = len(data)
+
+    # Number of argument bytes for each possible ID byte value, or -1 if the
+    # ID is invalid.
+    id_to_num_arg_bytes = [-1] * 256
+    for id, msg_meta in lwl_msg_set.lwl_msgs.items():
+        if id < 256:
+            id_to_num_arg_bytes[id] = msg_meta.num_arg_bytes
+
     for offset in range(lwl_msg_set.max_msg_len):
         start_idx = put_idx + offset
         if (start_idx >= num_data_bytes):
             start_idx -= num_data_bytes
-        idx = start_idx
-        first_get = True
-        invalid_id_ctr = 0
-
-        while (True):
-            try:
-                id, idx = get_data_bytes(data, idx, 1, put_idx, first_get)
-            except EOFError:
-                break
-
-            first_get = False
-            msg_meta = lwl_msg_set.get_metadata(id)
-            if msg_meta == None:
-                _log.debug('Invalid ID %d at idx %d' % (id, idx));
-                invalid_id_ctr += 1
-                continue
-
-            _log.debug('Valid ID %d at idx %d' % (id, idx));
-
-            # The ID is valid. Try to get the argument bytes.
-            save_idx = idx
-            try:
-                _, idx = get_data_bytes(data, idx, msg_meta.num_arg_bytes,
-                                        put_idx, first_get)
-            except EOFError:
-                _log.debug('Insufficient data for aguments')
-                idx = save_idx
+        # Stop counting once this offset can't do better than the best so far.
+        invalid_id_ctr = _count_invalid_ids(data, put_idx, start_idx,
+                                            id_to_num_arg_bytes,
+                                            min_invalid_ids)
 
         if invalid_id_ctr < min_invalid_ids:
             min_invalid_ids = invalid_id_ctr
             optimal_start_idx = start_idx
-            _log.debug('New optimal start_idx %d invalid_id_ctr=%d' %
-                       (start_idx, invalid_id_ctr))
+            _log.debug('New optimal start_idx %d invalid_id_ctr=%d',
+                       start_idx, invalid_id_ctr)
 
     return optimal_start_idx
 
 def print_data(data, start_idx, put_idx):
     """
-    Print a set of messages given the raw data (bytearray) and the put index.
+    Print a set of messages given the raw data (memoryview) and the put index.
 
     Parameters:
-        data (bytearray)    : Encoded data
+        data (memoryview)   : Encoded data
         put_idx (int)       : Index of next byte to be written (i.e. oldest).
 
     Returns:
@@ -378,6 +496,12 @@ def print_data(data, start_idx, put_idx):
     in_sync = False
     first_get = True
     skipped_data = []
+    debug = _log.isEnabledFor(logging.DEBUG)
+
+    # Scratch list for argument values, reused for each message.
+    arg_values = [0] * max((len(msg_meta.arg_byte_sizes)
+                            for msg_meta in lwl_msg_set.lwl_msgs.values()),
+                           default=0)
 
     try:
         while True:
@@ -394,7 +518,8 @@ def print_data(data, start_idx, put_idx):
 
             while not msg_meta:
                 id_idx = idx;
-                _log.debug('Get LWL id')
+                if debug:
+                    _log.debug('Get LWL id')
                 id, idx = get_data_bytes(data, idx, 1, put_idx,
                                          first_get)
                 first_get = False
@@ -406,15 +531,15 @@ def print_data(data, start_idx, put_idx):
                     continue
 
             # We have a potential ID, now get the arguments.
-            arg_values = []
-            for arg_bytes in msg_meta.arg_bytes:
-                arg_bytes = int(arg_bytes)
-                arg_value, idx = get_data_bytes(data, idx, arg_bytes,
-                                                put_idx, first_get)
-                arg_values.append(arg_value)
-            _log.debug('id=%d arg_values=%s', id, arg_values)
-            print(msg_meta.fmt % tuple(arg_values))
-            _log.debug('----------------------------------------')
+            num_args = len(msg_meta.arg_byte_sizes)
+            for arg_idx, arg_bytes in enumerate(msg_meta.arg_byte_sizes):
+                arg_values[arg_idx], idx = get_data_bytes(data, idx, arg_bytes,
+                                                          put_idx, first_get)
+            if debug:
+                _log.debug('id=%d arg_values=%s', id, arg_values[:num_args])
+            print(msg_meta.fmt % tuple(arg_values[:num_args]))
+            if debug:
+                _log.debug('----------------------------------------')
 
     except EOFError:
         pass
@@ -434,21 +559,44 @@ def print_data(data, start_idx, put_idx):
         print('Unused data (hex): %s' %
               ' '.join(['%02x' % tmp for tmp in unused_data]))
 
+def find_source_files(dir_path):
+    """
+    Generate the paths of all .c files under a directory.
+
+    Parameters:
+        dir_path (str) : Directory to search (recursively).
+
+    As with os.walk(), the files in a directory come before those in its
+    subdirectories, symbolic links to directories are not followed, and
+    directories that can't be read are ignored.
+    """
+
+    try:
+        entries = list(os.scandir(dir_path))
+    except OSError:
+        _log.debug('Cannot scan directory %s', dir_path)
+        return
+
+    sub_dir_paths = []
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            sub_dir_paths.append(entry.path)
+        elif entry.name.endswith('.c') and entry.is_file():
+            yield entry.path
+    for sub_dir_path in sub_dir_paths:
+        yield from find_source_files(sub_dir_path)
+
 def parse_source_dir(dir_path):
     error_count = 0
-    _log.debug('parse_source_dir(dir_path=%s)' % dir_path)
+    _log.debug('parse_source_dir(dir_path=%s)', dir_path)
 
-    for root_dir_path, dir_names, file_names in os.walk(dir_path):
-        for file_name in file_names:
-            file_path = os.path.join(root_dir_path, file_name)
-            if file_path[-2:] != '.c':
-                _log.debug('Skip parsing for %s' % file_path)
-                continue
-            error_count += parse_source_file(file_path)
+    for file_path in find_source_files(dir_path):
+        error_count += parse_source_file(file_path)
     return error_count
 
 def swap32(i):
-    return struct.unpack("<I", struct.pack(">I", i))[0]
+    return (((i & 0xff) << 24) | ((i & 0xff00) << 8) |
+            ((i >> 8) & 0xff00) | ((i >> 24) & 0xff))
 
 def decode_data_file(file_path):
     """
@@ -459,6 +607,9 @@ def decode_data_file(file_path):
     size:<buffer-size>
     put:<put-index>
 
+    followed by lines of hex data. Whitespace within the lines is ignored, as
+    are lines that are not all hex digits.
+
     The put index is the next byte to be written, which will be an
     lwl ID.
     """
@@ -466,9 +617,7 @@ def decode_data_file(file_path):
     _log.debug('decode_data_file(file_path=%s)', file_path)
 
     error_count = 0
-    hex_data = ''
-    size_pat = re.compile('^size:(\d+)')
-    put_pat = re.compile('^put:(\d+)')
+    hex_parts = []
     buf_size = None
     put_idx = None
     with open(file_path) as f:
@@ -478,11 +627,11 @@ def decode_data_file(file_path):
             line_num += 1
             line = line.strip()
 
-            m = re.match(size_pat, line)
+            m = _SIZE_PAT.match(line)
             if m:
                 buf_size = int(m.group(1))
                 continue
-            m = re.match(put_pat, line)
+            m = _PUT_PAT.match(line)
             if m:
                 put_idx = int(m.group(1))
                 continue
@@ -491,15 +640,11 @@ def decode_data_file(file_path):
             if not line:
                 continue
             #_log.debug('line=[%s]', line)
-            is_hex = True
-            for c in line:
-                if c not in string.hexdigits:
-                    is_hex = False
-                    break
-            if not is_hex:
+            if not _HEX_PAT.fullmatch(line):
                 continue
-            hex_data = hex_data + line
+            hex_parts.append(line)
 
+    hex_data = ''.join(hex_parts)
     _log.debug('Got %d hex chars', len(hex_data))
 
     if (put_idx is None) or (buf_size is None):
@@ -514,7 +659,10 @@ def decode_data_file(file_path):
     if ((len(hex_data) % 2) != 0):
         print('Odd number of hex chars (%d)' % len(hex_data))
         return 1;
-    data = bytearray.fromhex(hex_data)
+
+    # Convert all the data at once. The data is never modified, so use bytes,
+    # and a memoryview over it so that slices of it are not copies.
+    data = memoryview(bytes.fromhex(hex_data))
 
     start_idx = get_optimal_start_idx(data, put_idx)
 